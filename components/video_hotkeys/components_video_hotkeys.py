@@ -1,7 +1,21 @@
-# Minimal placeholder so imports succeed if you don't have the real JS build yet.
+# Video player with keyboard hotkeys (index.html in this folder).
+# Falls back to a plain st.video if the frontend file isn't shipped.
+# Not wired into any page yet: its <video> element only plays direct media
+# URLs, while stored videos are YouTube links or server-side upload paths,
+# which st.video serves and this frame cannot.
+import os
 import streamlit as st
+import streamlit.components.v1 as components
 from typing import Optional, Dict
 
-def streamlit_video_component(video_url: str, start_time: float = 0.0) -> Optional[Dict]:
-    st.video(video_url, start_time=int(start_time))
-    return None
+_build_dir = os.path.dirname(os.path.abspath(__file__))
+
+_video_hotkeys = None
+if os.path.exists(os.path.join(_build_dir, "index.html")):
+    _video_hotkeys = components.declare_component("video_hotkeys", path=_build_dir)
+
+def streamlit_video_component(video_url: str, start_time: float = 0.0, key: Optional[str] = None) -> Optional[Dict]:
+    if _video_hotkeys is None:
+        st.video(video_url, start_time=int(start_time))
+        return None
+    return _video_hotkeys(url=video_url, start=float(start_time), key=key, default=None)
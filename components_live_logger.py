@@ -1,33 +1,45 @@
 import streamlit as st
-import pandas as pd
+from event_queue import queue_event, flush_events, flush_on_change, flush_stale, pending_events
 
-def live_logger(conn, match_id, players, metrics):
-    st.subheader("🏷️ Live Event Tagging")
-
-    player_names = [p["name"] for p in players]
-    metric_labels = [m["label"] for m in metrics]
+@st.fragment
+def _event_picker(conn, match_id, players, metrics):
+    """Player/metric pickers + Add button. A fragment: a click reruns only this block."""
+    player_id_by_name = {p["name"]: p["id"] for p in players}
+    metric_id_by_label = {m["label"]: m["id"] for m in metrics}
+    player_names = list(player_id_by_name)
+    metric_labels = list(metric_id_by_label)
 
     event_player = st.selectbox("Player", player_names, key="live_player")
     event_metric = st.selectbox("Metric", metric_labels, key="live_metric")
 
     if st.button("Add Event", use_container_width=True, key="live_add"):
-        m_id = next(m["id"] for m in metrics if m["label"] == event_metric)
-        p_id = next(p["id"] for p in players if p["name"] == event_player)
-
-        conn.execute(
-            "INSERT INTO events(match_id, player_id, metric_id) VALUES(?,?,?)",
-            (match_id, p_id, m_id)
-        )
-        conn.commit()
+        m_id = metric_id_by_label[event_metric]
+        p_id = player_id_by_name[event_player]
+
+        queue_event(conn, match_id, p_id, m_id)
         st.success(f"✅ {event_player} • {event_metric}")
 
+
+def live_logger(conn, match_id, players, metrics):
+    st.subheader("🏷️ Live Event Tagging")
+    flush_on_change(conn, "_live_scope", match_id)
+    flush_stale(conn)
+
+    _event_picker(conn, match_id, players, metrics)
+
+    n_pending = len(pending_events())
+    if n_pending and st.button(f"💾 Save {n_pending} pending event(s)", key="live_flush"):
+        flush_events(conn)
+
     st.markdown("### 📋 Recent Events")
+    if not st.toggle("Show recent events", value=True, key="live_show_recent"):
+        return
 
-    df = pd.read_sql(
+    rows = [dict(r) for r in conn.execute(
         "SELECT e.id, p.name player, m.label metric, e.ts "
         "FROM events e JOIN players p ON p.id=e.player_id "
         "JOIN metrics m ON m.id=e.metric_id "
         "WHERE match_id=? ORDER BY e.id DESC LIMIT 20",
-        conn, params=(match_id,)
-    )
-    st.dataframe(df, use_container_width=True)
+        (match_id,)
+    ).fetchall()]
+    st.table(rows)
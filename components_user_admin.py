@@ -1,5 +1,6 @@
-import sqlite3, bcrypt
+import sqlite3
 import streamlit as st
+from passwords import hash_password, verify_password
 
 def user_admin(conn, current_role):
     if current_role != "admin":
@@ -16,23 +17,28 @@ def user_admin(conn, current_role):
         np = st.sidebar.text_input("Password", type="password")
         role = st.sidebar.selectbox("Role", ["admin", "analyst", "viewer"])
         if st.sidebar.button("Create User"):
-            ph = bcrypt.hashpw(np.encode(), bcrypt.gensalt())
-            conn.execute(
-                "INSERT OR REPLACE INTO users(username, pass_hash, role, active) VALUES(?,?,?,1)",
-                (nu, ph, role),
-            )
-            conn.commit()
+            ph = hash_password(np)
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO users(username, pass_hash, role, active) VALUES(?,?,?,1)",
+                    (nu, ph, role),
+                )
             st.sidebar.success(f"✅ User {nu} created")
 
     # Edit existing users
     if tab == "Edit Users":
         st.sidebar.write("#### ✏️ Manage Users")
         users = conn.execute("SELECT username, role, active FROM users").fetchall()
+        changed = []
         for u in users:
             with st.sidebar.expander(f"{u['username']} ({u['role']})"):
                 active = st.checkbox("Active", u["active"] == 1, key=f"act_{u['username']}")
-                conn.execute("UPDATE users SET active=? WHERE username=?", (int(active), u["username"]))
-                conn.commit()
+                if active != (u["active"] == 1):
+                    changed.append((int(active), u["username"]))
+        # only write rows whose checkbox actually changed
+        if changed:
+            with conn:
+                conn.executemany("UPDATE users SET active=? WHERE username=?", changed)
 
     # Change own password
     if tab == "Change My Password":
@@ -42,10 +48,12 @@ def user_admin(conn, current_role):
         if st.sidebar.button("Update Password"):
             user = st.session_state.user["u"]
             row = conn.execute("SELECT pass_hash FROM users WHERE username=?", (user,)).fetchone()
-            if bcrypt.checkpw(old.encode(), row["pass_hash"]):
-                ph = bcrypt.hashpw(new.encode(), bcrypt.gensalt())
-                conn.execute("UPDATE users SET pass_hash=? WHERE username=?", (ph, user))
-                conn.commit()
+            # rehash=False: the hash is replaced below, so skip the over-cost rehash
+            ok, _ = verify_password(old, row["pass_hash"], rehash=False)
+            if ok:
+                ph = hash_password(new)
+                with conn:
+                    conn.execute("UPDATE users SET pass_hash=? WHERE username=?", (ph, user))
                 st.sidebar.success("✅ Password Updated")
             else:
                 st.sidebar.error("❌ Wrong old password")
@@ -0,0 +1,82 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Per-connection settings: apply on every sqlite3.connect(), not just once.
+CONN_PRAGMAS = """
+    PRAGMA foreign_keys=ON;
+    PRAGMA busy_timeout=5000;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA cache_size=-65536;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+"""
+
+# The writer also owns the (persistent) journal mode.
+WRITER_PRAGMAS = "PRAGMA journal_mode=WAL; PRAGMA wal_autocheckpoint=1000;" + CONN_PRAGMAS
+
+
+# Bumped after every committed ``with conn:`` block on the writer. One writer
+# per process, so this is an exact data version for the read caches, unlike
+# file mtimes (coarse ticks) or WAL sizes (unchanged after a WAL restart).
+_write_version = 0
+
+
+def write_version() -> int:
+    return _write_version
+
+
+class WriterConnection(sqlite3.Connection):
+    """The single shared writer. ``with conn:`` also takes a process-wide lock,
+    so write transactions from concurrent sessions queue up in-process
+    instead of interleaving on the one connection or hitting SQLITE_BUSY."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wlock = threading.RLock()
+
+    def __enter__(self):
+        self._wlock.acquire()
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        global _write_version
+        try:
+            result = super().__exit__(*exc)
+            if exc[0] is None:  # committed
+                _write_version += 1
+            return result
+        finally:
+            self._wlock.release()
+
+
+class ReaderPool:
+    """N read-only connections (``mode=ro``); under WAL they read concurrently
+    with each other and with the writer."""
+
+    def __init__(self, path: str, size: int = 4, pragmas: str = ""):
+        self.path = path
+        self._pragmas = pragmas
+        self._free = queue.LifoQueue()
+        self._sem = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        c = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                            check_same_thread=False, cached_statements=256)
+        c.row_factory = sqlite3.Row  # same row shape as the writer (streamlit_app.get_conn)
+        if self._pragmas:
+            c.executescript(self._pragmas)
+        return c
+
+    @contextmanager
+    def read(self):
+        with self._sem:
+            try:
+                c = self._free.get_nowait()
+            except queue.Empty:
+                c = self._open()
+            try:
+                yield c
+            finally:
+                self._free.put(c)
@@ -0,0 +1,99 @@
+import atexit
+import sqlite3
+import time
+import weakref
+import datetime as dt
+import streamlit as st
+
+# Tag clicks are queued in the session and written in one transaction,
+# instead of one INSERT + commit (fsync) per click. A batch is written once
+# FLUSH_AT events are queued, or once the oldest has waited FLUSH_AFTER
+# seconds: checked on the next click and at the top of the next full rerun.
+FLUSH_AT = 8
+FLUSH_AFTER = 0.5
+
+INSERT_EVENT_SQL = "INSERT INTO events(match_id,player_id,metric_id,value,ts) VALUES(?,?,?,?,?)"
+# fallback for a batch whose match was deleted meanwhile: skips just those rows
+INSERT_EVENT_IF_MATCH_SQL = ("INSERT INTO events(match_id,player_id,metric_id,value,ts) SELECT ?,?,?,?,? "
+                             "WHERE EXISTS (SELECT 1 FROM matches WHERE id=?)")
+
+
+class _Pending(list):
+    """Per-session event buffer; remembers its connection for the exit flush."""
+    conn = None
+    since = 0.0  # monotonic time of the oldest queued event
+
+
+# every live session buffer, so whatever is still queued at shutdown is saved
+_BUFFERS = weakref.WeakValueDictionary()
+
+
+def pending_events() -> list:
+    buf = st.session_state.get("_pending_events")
+    if buf is None:
+        buf = st.session_state["_pending_events"] = _Pending()
+        _BUFFERS[id(buf)] = buf
+    return buf
+
+
+def _write(conn, buf) -> int:
+    try:
+        with conn:
+            conn.executemany(INSERT_EVENT_SQL, buf)
+        n = len(buf)
+    except sqlite3.IntegrityError:
+        # another session deleted a queued tag's match (events.match_id FK):
+        # save the rest and drop those, instead of failing on every flush
+        with conn:
+            n = conn.executemany(INSERT_EVENT_IF_MATCH_SQL, [(*r, r[0]) for r in buf]).rowcount
+        if n < len(buf):
+            st.warning(f"{len(buf) - n} queued tag(s) were dropped: their match was deleted.")
+    buf.clear()
+    return n
+
+
+def queue_event(conn, match_id, player_id, metric_id, value=1):
+    """Buffer one event; flushes automatically once FLUSH_AT are pending."""
+    ts = dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    pending = pending_events()
+    pending.conn = conn
+    now = time.monotonic()
+    if pending and now - pending.since >= FLUSH_AFTER:
+        _write(conn, pending)  # the old batch is due; this click starts a new one
+    if not pending:
+        pending.since = now
+    pending.append((int(match_id), int(player_id), int(metric_id), float(value), ts))
+    if len(pending) >= FLUSH_AT:
+        flush_events(conn)
+
+
+def flush_events(conn) -> int:
+    pending = pending_events()
+    if not pending:
+        return 0
+    return _write(conn, pending)
+
+
+def flush_stale(conn) -> int:
+    """Call at the top of a rerun: writes the queue if it has waited FLUSH_AFTER."""
+    pending = st.session_state.get("_pending_events")
+    if pending and time.monotonic() - pending.since >= FLUSH_AFTER:
+        return _write(conn, pending)
+    return 0
+
+
+def flush_on_change(conn, scope_key: str, scope) -> None:
+    """Flush the queue when the selected match/video (``scope``) changes."""
+    if st.session_state.get(scope_key) != scope:
+        flush_events(conn)
+        st.session_state[scope_key] = scope
+
+
+@atexit.register
+def _flush_all():
+    for buf in list(_BUFFERS.values()):
+        if buf and buf.conn is not None:
+            try:
+                _write(buf.conn, buf)
+            except sqlite3.Error:
+                pass
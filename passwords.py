@@ -0,0 +1,59 @@
+import os
+import concurrent.futures
+import bcrypt
+import streamlit as st
+
+# bcrypt work factor used for every new hash. The bcrypt package defaults to
+# 12 (~4x slower than 10), which stalls the Streamlit rerun on each
+# create/reset/change-password click. Override with the BCRYPT_COST env var
+# (BCRYPT_ROUNDS is accepted as an alias).
+BCRYPT_COST = int(os.environ.get("BCRYPT_COST", os.environ.get("BCRYPT_ROUNDS", "10")))
+
+# bcrypt releases the GIL, so hashing here runs alongside the script thread
+# (and two hashes run in parallel on a multi-core host).
+_BCRYPT_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+# Throwaway hash at the lowest cost, checked once to start the pool threads
+_WARM_HASH = bcrypt.hashpw(b"warm", bcrypt.gensalt(4))
+
+
+def warm_up():
+    """Start the pool threads early so the first login does not pay for them."""
+    _BCRYPT_POOL.submit(bcrypt.checkpw, b"warm", _WARM_HASH)
+
+
+def hash_password(pw: str) -> bytes:
+    fut = _BCRYPT_POOL.submit(bcrypt.hashpw, pw.encode(), bcrypt.gensalt(BCRYPT_COST))
+    with st.spinner("Hashing..."):
+        return fut.result()
+
+
+def _cost(stored: bytes) -> int:
+    # "$2b$12$..." -> 12
+    try:
+        return int(stored[4:6])
+    except ValueError:
+        return 0
+
+
+def _verify(pw: bytes, stored: bytes, rehash: bool):
+    if not bcrypt.checkpw(pw, stored):
+        return False, None
+    if rehash and _cost(stored) > BCRYPT_COST:
+        return True, bcrypt.hashpw(pw, bcrypt.gensalt(BCRYPT_COST))
+    return True, None
+
+
+def verify_password(pw: str, stored, rehash: bool = True):
+    """Check ``pw`` against ``stored`` off the script thread.
+
+    Returns ``(ok, new_hash)``; ``new_hash`` is set when the stored hash
+    used a higher cost than BCRYPT_COST and should be replaced, so hashes
+    migrate to the current policy as users log in. Pass ``rehash=False``
+    when the caller is about to replace the hash anyway (password change).
+    """
+    if isinstance(stored, str):
+        stored = stored.encode()
+    fut = _BCRYPT_POOL.submit(_verify, pw.encode(), stored, rehash)
+    with st.spinner("Checking password..."):
+        return fut.result()
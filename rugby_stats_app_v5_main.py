@@ -1,17 +1,109 @@
 #!/usr/bin/env python3
-import bcrypt
-import sqlite3, datetime as dt
+import os, sqlite3, datetime as dt
+from collections import defaultdict
+from contextlib import contextmanager
 import pandas as pd
 import streamlit as st
-import altair as alt
-import streamlit.components.v1 as components
-import plotly.express as px
+from passwords import hash_password
+from db_pool import ReaderPool, CONN_PRAGMAS, WRITER_PRAGMAS, write_version
+from event_queue import queue_event, flush_events, flush_on_change, flush_stale, pending_events
 
 # ---------------- DB Helpers ----------------
+# Bump when the DDL / compatibility patches below change.
+SCHEMA_VERSION = 6
+
+# Hot write statements, kept as constants so the connection's statement
+# cache (cached_statements=256 in get_conn) always hits on the same string.
+INSERT_MOMENT_SQL = "INSERT INTO moments(match_id,video_id,video_ts,note) VALUES(?,?,?,?)"
+# Recent Tags, every tagging rerun: no join, names come from cached lookups;
+# range scan on idx_events_match_recent
+RECENT_TAGS_SQL = (
+    "SELECT player_id, metric_id, ROUND(value,1), ts FROM events "
+    "WHERE match_id=? ORDER BY id DESC LIMIT ?"
+)
+
+BOOKMARK_PAGE_SIZE = 50
+RECENT_TAGS = 12
+
+# fixed metric groups; unknown group names fall back to "Other"
+METRIC_GROUPS = ("Attack", "Defense", "Set Piece", "Kicking", "Discipline", "Other")
+METRIC_GROUP_INDEX = {g: i for i, g in enumerate(METRIC_GROUPS)}
+METRIC_TYPES = ("count", "value")
+
+ROLES = ("admin", "editor", "viewer")
+ROLE_INDEX = {r: i for i, r in enumerate(ROLES)}
+
+# Tables owned by a match. match_id cascades, so deleting a match is a
+# single DELETE FROM matches (needs PRAGMA foreign_keys=ON, see CONN_PRAGMAS).
+MATCH_CHILD_TABLES = {
+    "events": """(
+        id INTEGER PRIMARY KEY,
+        match_id INTEGER REFERENCES matches(id) ON DELETE CASCADE,
+        player_id INTEGER,
+        metric_id INTEGER,
+        value REAL DEFAULT 1,
+        ts TEXT DEFAULT CURRENT_TIMESTAMP,
+        team_id INTEGER
+    )""",
+    "videos": """(
+        id INTEGER PRIMARY KEY,
+        match_id INTEGER REFERENCES matches(id) ON DELETE CASCADE,
+        kind TEXT,
+        url TEXT,
+        label TEXT,
+        offset REAL DEFAULT 0
+    )""",
+    "moments": """(
+        id INTEGER PRIMARY KEY,
+        match_id INTEGER REFERENCES matches(id) ON DELETE CASCADE,
+        video_id INTEGER,
+        video_ts REAL,
+        note TEXT,
+        ts TEXT DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "match_squad": """(
+        id INTEGER PRIMARY KEY,
+        match_id INTEGER NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
+        player_id INTEGER NOT NULL,
+        shirt_number INTEGER,
+        starting INTEGER NOT NULL DEFAULT 1,
+        UNIQUE(match_id, player_id)
+    )""",
+}
+
+def _migrate_match_cascade(conn):
+    """Rebuild pre-FK child tables with the cascading match_id (one-time)."""
+    for t, ddl in MATCH_CHILD_TABLES.items():
+        fks = conn.execute(f"PRAGMA foreign_key_list({t})").fetchall()
+        if any(fk[2] == "matches" for fk in fks):
+            continue
+        old_cols = [r[1] for r in conn.execute(f"PRAGMA table_info({t})")]
+        conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            conn.execute("BEGIN")
+            conn.execute(f"CREATE TABLE {t}_new{ddl}")
+            new_cols = {r[1] for r in conn.execute(f"PRAGMA table_info({t}_new)")}
+            cols = ", ".join(c for c in old_cols if c in new_cols)
+            conn.execute(f"INSERT INTO {t}_new({cols}) SELECT {cols} FROM {t}")
+            conn.execute(f"DROP TABLE {t}")
+            conn.execute(f"ALTER TABLE {t}_new RENAME TO {t}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("PRAGMA foreign_keys=ON")
+
 def init_db(conn):
-    conn.executescript("""
-    PRAGMA journal_mode=WAL;
+    conn.executescript(WRITER_PRAGMAS)
 
+    # schema: skipped once the DB is at the current version
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    # one transaction for the whole DDL script: a single WAL commit on first boot
+    conn.executescript("""
+    BEGIN;
     CREATE TABLE IF NOT EXISTS players(
         id INTEGER PRIMARY KEY,
         name TEXT,
@@ -37,33 +129,6 @@ def init_db(conn):
         team_id INTEGER
     );
 
-    CREATE TABLE IF NOT EXISTS events(
-        id INTEGER PRIMARY KEY,
-        match_id INTEGER,
-        player_id INTEGER,
-        metric_id INTEGER,
-        value REAL DEFAULT 1,
-        ts TEXT DEFAULT CURRENT_TIMESTAMP
-    );
-
-    CREATE TABLE IF NOT EXISTS videos(
-        id INTEGER PRIMARY KEY,
-        match_id INTEGER,
-        kind TEXT,
-        url TEXT,
-        label TEXT,
-        offset REAL DEFAULT 0
-    );
-
-    CREATE TABLE IF NOT EXISTS moments(
-        id INTEGER PRIMARY KEY,
-        match_id INTEGER,
-        video_id INTEGER,
-        video_ts REAL,
-        note TEXT,
-        ts TEXT DEFAULT CURRENT_TIMESTAMP
-    );
-
     CREATE TABLE IF NOT EXISTS teams(
         id INTEGER PRIMARY KEY,
         name TEXT UNIQUE NOT NULL,
@@ -77,15 +142,9 @@ def init_db(conn):
         UNIQUE(team_id, player_id)
     );
 
-    CREATE TABLE IF NOT EXISTS match_squad(
-        id INTEGER PRIMARY KEY,
-        match_id INTEGER NOT NULL,
-        player_id INTEGER NOT NULL,
-        shirt_number INTEGER,
-        starting INTEGER NOT NULL DEFAULT 1,
-        UNIQUE(match_id, player_id)
-    );
-    """)
+    """ + "".join(
+        f"\n    CREATE TABLE IF NOT EXISTS {t}{ddl};\n" for t, ddl in MATCH_CHILD_TABLES.items()
+    ) + "\n    COMMIT;\n")
 
     # --- Backward compatibility patches ---
     # Ensure matches table has team_id column
@@ -105,21 +164,139 @@ def init_db(conn):
             pass
 
     conn.commit()
+    _migrate_match_cascade(conn)
 
+    conn.executescript("""
+    DROP INDEX IF EXISTS idx_events_match_id_id;
+    CREATE INDEX IF NOT EXISTS idx_events_match_recent ON events(match_id, id DESC, player_id, metric_id);
+    CREATE INDEX IF NOT EXISTS idx_events_match_player_metric ON events(match_id, player_id, metric_id);
+    DROP INDEX IF EXISTS idx_events_player_metric;
+    CREATE INDEX IF NOT EXISTS idx_events_player_metric_match ON events(player_id, metric_id, match_id);
+    CREATE INDEX IF NOT EXISTS idx_moments_match_video ON moments(match_id, video_id, video_ts);
+    CREATE INDEX IF NOT EXISTS idx_matches_date ON matches(date);
+    ANALYZE;
+    """)
 
-    # Backfill column if needed
-    cols = {r[1] for r in conn.execute("PRAGMA table_info(matches)").fetchall()}
-    if "team_id" not in cols:
-        try:
-            conn.execute("ALTER TABLE matches ADD COLUMN team_id INTEGER;")
-        except sqlite3.OperationalError:
-            pass
-
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
 
 
+# ---------------- Cached reads ----------------
+# The lookup tables below are re-read on every rerun (every click). They are
+# cached per DB file and keyed on the writer's process-wide commit counter
+# (db_pool.write_version), so any write through ``with conn:`` invalidates
+# them exactly, from whichever browser tab it came. The mtime/size of the DB
+# + its WAL ride along to catch writes from outside the shared writer.
+# Since the stamp already invalidates, the TTL only ages out entries for old
+# stamps; max_entries bounds that garbage instead of a short TTL re-reading
+# unchanged tables every 30s.
+CACHE_TTL = 600
+CACHE_ENTRIES = 256
+_DB_PATHS = {}
+
+def _db_path(conn) -> str:
+    path = _DB_PATHS.get(id(conn))
+    if path is None:
+        path = _DB_PATHS[id(conn)] = conn.execute("PRAGMA database_list").fetchone()[2]
+    return path
+
+def _db_stamp(db_path: str):
+    stamp = []
+    for p in (db_path, db_path + "-wal"):
+        try:
+            s = os.stat(p)
+            stamp.append((s.st_mtime_ns, s.st_size))
+        except OSError:
+            stamp.append(None)
+    return (write_version(), *stamp)
+
+# Cache misses read through a small pool of read-only connections, so they
+# never contend with the shared writer (streamlit_app.get_conn) and keep a
+# warm page cache. WAL lets these readers run alongside the writer.
+def _tuples(conn, sql, params=()):
+    """(column names, rows as plain tuples), whatever the connection's row_factory."""
+    cur = conn.cursor()
+    cur.row_factory = None
+    cur.execute(sql, params)
+    return [d[0] for d in cur.description], cur.fetchall()
+
+def _frame(conn, sql, params=()):
+    # small lookup tables: a bare cursor + from_records is cheaper than pd.read_sql
+    names, rows = _tuples(conn, sql, params)
+    return pd.DataFrame.from_records(rows, columns=names)
+
+@st.cache_resource
+def _reader_pool(db_path: str) -> ReaderPool:
+    return ReaderPool(db_path, size=4, pragmas=CONN_PRAGMAS)
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def _read_df(db_path: str, mtime, sql: str, params: tuple = ()):
+    with _reader_pool(db_path).read() as c:
+        return _frame(c, sql, params)
+
+@contextmanager
+def _read_conn(conn):
+    """A pooled read-only connection for uncached reads, off the shared writer."""
+    path = _db_path(conn)
+    if not path:  # in-memory DB: readers can't see it
+        yield conn
+        return
+    with _reader_pool(path).read() as rc:
+        yield rc
+
+def _cached_read(conn, sql, params=()):
+    path = _db_path(conn)
+    if not path:  # in-memory DB: nothing to key on
+        return _frame(conn, sql, params)
+    return _read_df(path, _db_stamp(path), sql, tuple(params))
+
+# Report-sized frames: kept as one shared object (no pickle round-trip per hit,
+# unlike cache_data); callers get a .copy() so the cached frame is never mutated.
+@st.cache_resource(ttl=CACHE_TTL, max_entries=32, show_spinner=False)
+def _read_df_shared(db_path: str, mtime, sql: str, params: tuple = ()):
+    with _reader_pool(db_path).read() as c:
+        return _frame(c, sql, params)
+
+def _shared_read(conn, sql, params=()):
+    path = _db_path(conn)
+    if not path:
+        return _frame(conn, sql, params)
+    return _read_df_shared(path, _db_stamp(path), sql, tuple(params)).copy()
+
+def _columns(conn, sql, params=()) -> dict:
+    """column -> list of values (struct of arrays), without building a DataFrame."""
+    names, rows = _tuples(conn, sql, params)
+    cols = list(zip(*rows)) or [()] * len(names)
+    return {n: list(c) for n, c in zip(names, cols)}
+
+def _rows(conn, sql, params=()) -> list:
+    """Rows as plain dicts straight off the cursor, for callers that iterate records."""
+    names, rows = _tuples(conn, sql, params)
+    return [dict(zip(names, r)) for r in rows]
+
+def _col_rows(cols: dict) -> list:
+    """struct of arrays (_cached_cols) -> list of row dicts."""
+    return [dict(zip(cols, r)) for r in zip(*cols.values())]
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def _read_cols(db_path: str, mtime, sql: str, params: tuple = ()):
+    with _reader_pool(db_path).read() as c:
+        return _columns(c, sql, params)
+
+def _cached_cols(conn, sql, params=()) -> dict:
+    """Like _cached_read, for the hot pages that only need a few plain lists."""
+    path = _db_path(conn)
+    if not path:
+        return _columns(conn, sql, params)
+    return _read_cols(path, _db_stamp(path), sql, tuple(params))
+
 def _players_df(conn):
-    return pd.read_sql("SELECT id,name,position,active FROM players ORDER BY name", conn)
+    return _cached_read(conn, "SELECT id,name,position,active FROM players ORDER BY name")
+
+def _players_soa(conn, only_active=True) -> dict:
+    q = "SELECT id,name FROM players"
+    if only_active: q += " WHERE active=1"
+    return _cached_cols(conn, q + " ORDER BY name")
 
 # ---------------- METRICS SETTINGS ----------------
 def page_metrics(conn, role):
@@ -127,21 +304,8 @@ def page_metrics(conn, role):
 
     if role not in ("admin", "editor"):
         st.info("View-only access.")
-    
-    # fixed groups
-    METRIC_GROUPS = [
-        "Attack",
-        "Defense",
-        "Set Piece",
-        "Kicking",
-        "Discipline",
-        "Other"
-    ]
 
-    metrics = pd.read_sql(
-        "SELECT id, name, label, group_name, type, per80, weight, active FROM metrics ORDER BY group_name, label",
-        conn
-    )
+    metrics = _metrics_df(conn)
     st.dataframe(metrics, use_container_width=True)
 
     st.divider()
@@ -150,7 +314,7 @@ def page_metrics(conn, role):
     name = st.text_input("Internal name (no spaces, e.g. carry, tackle_miss)").strip()
     label = st.text_input("Display Label (e.g. Carry, Missed Tackle)").strip()
     group = st.selectbox("Group", METRIC_GROUPS)
-    mtype = st.selectbox("Type", ["count", "value"])
+    mtype = st.selectbox("Type", METRIC_TYPES)
     weight = st.number_input("Weight (optional)", value=1.0)
     
     if st.button("Create Metric", disabled=role not in ("admin","editor")):
@@ -172,13 +336,14 @@ def page_metrics(conn, role):
     st.subheader("✏️ Edit Metric")
 
     if not metrics.empty:
-        sel = st.selectbox("Metric", metrics["id"].tolist(),
-            format_func=lambda x: metrics.set_index("id").loc[x,"label"]
+        metric_labels = dict(zip(metrics["id"], metrics["label"]))
+        sel = st.selectbox("Metric", list(metric_labels),
+            format_func=metric_labels.__getitem__
         )
-        r = metrics[metrics["id"]==sel].iloc[0]
+        r = metrics.set_index("id").to_dict("index")[sel]
 
         new_label = st.text_input("Label", r["label"], key=f"ml_{sel}")
-        new_group = st.selectbox("Group", METRIC_GROUPS, index=METRIC_GROUPS.index(r["group_name"]), key=f"mg_{sel}")
+        new_group = st.selectbox("Group", METRIC_GROUPS, index=METRIC_GROUP_INDEX.get(r["group_name"], len(METRIC_GROUPS) - 1), key=f"mg_{sel}")
         new_active = st.checkbox("Active", value=bool(r["active"]), key=f"ma_{sel}")
         new_weight = st.number_input("Weight", value=float(r["weight"] or 1), key=f"mw_{sel}")
 
@@ -192,161 +357,99 @@ def page_metrics(conn, role):
             st.success("✅ Updated")
             st.rerun()
 
+ACTIVE_METRICS_SQL = ("SELECT id,name,label,group_name,type,per80,weight,active FROM metrics "
+                      "WHERE active=1 ORDER BY group_name,label")
+
 def _metrics_df(conn, only_active=False):
-    q = "SELECT id,name,label,group_name,type,per80,weight,active FROM metrics"
-    if only_active: q += " WHERE active=1"
-    q += " ORDER BY group_name,label"
-    return pd.read_sql(q, conn)
+    if only_active:
+        return _cached_read(conn, ACTIVE_METRICS_SQL)
+    return _cached_read(conn, "SELECT id,name,label,group_name,type,per80,weight,active FROM metrics "
+                              "ORDER BY group_name,label")
+
+def _metric_labels(conn) -> dict:
+    m = _cached_cols(conn, "SELECT id,label FROM metrics")
+    return dict(zip(m["id"], m["label"]))
+
+def _group_metrics(metrics) -> dict:
+    """group_name -> [metric records], groups in sorted order. One pass over metrics."""
+    groups = defaultdict(list)
+    for m in metrics:
+        groups[m["group_name"]].append(m)
+    return {grp: groups[grp] for grp in sorted(groups)}
+
+# Records + grouping are derived data; keep them per DB stamp so the tagging
+# page's reruns reuse one object instead of regrouping. Callers only read them.
+@st.cache_resource(ttl=CACHE_TTL, max_entries=8, show_spinner=False)
+def _tag_metrics_shared(db_path: str, mtime):
+    with _reader_pool(db_path).read() as c:
+        metrics = _rows(c, ACTIVE_METRICS_SQL)
+    return metrics, _group_metrics(metrics)
+
+def _tag_metrics(conn):
+    """(active metric records, group_name -> records) for the tagging panel."""
+    path = _db_path(conn)
+    if not path:
+        metrics = _rows(conn, ACTIVE_METRICS_SQL)
+        return metrics, _group_metrics(metrics)
+    return _tag_metrics_shared(path, _db_stamp(path))
 
 def _matches_df(conn):
-    return pd.read_sql("SELECT id,opponent,date,team_id FROM matches ORDER BY date DESC,id DESC", conn)
+    return _cached_read(conn, "SELECT id,opponent,date,team_id FROM matches ORDER BY date DESC,id DESC")
+
+def _match_labels(matches) -> dict:
+    """id -> "date — opponent", for match selectbox format_func."""
+    return {r.id: f"{r.date} — {r.opponent}" for r in matches.itertuples(index=False)}
+
+def _match_select(label, matches, **kwargs):
+    labels = _match_labels(matches)
+    return st.selectbox(label, list(labels), format_func=labels.__getitem__, **kwargs)
 
 def _teams_df(conn):
-    return pd.read_sql("SELECT id,name,active FROM teams ORDER BY name", conn)
+    return _cached_read(conn, "SELECT id,name,active FROM teams ORDER BY name")
 
 def _team_players_df(conn, team_id: int):
-    return pd.read_sql("""
+    return _cached_read(conn, """
         SELECT p.id, p.name, p.position, p.active
         FROM team_players tp
         JOIN players p ON p.id = tp.player_id
         WHERE tp.team_id=?
         ORDER BY p.name
-    """, conn, params=(int(team_id),))
+    """, (int(team_id),))
 
 def _squad_df(conn, match_id: int):
-    return pd.read_sql("""
+    return _cached_read(conn, """
         SELECT ms.player_id, p.name, p.position, ms.shirt_number, ms.starting
         FROM match_squad ms
         JOIN players p ON p.id=ms.player_id
         WHERE ms.match_id=?
         ORDER BY COALESCE(ms.shirt_number, 999), p.name
-    """, conn, params=(int(match_id),))
+    """, (int(match_id),))
 
-# ---------------- VIDEO UPLOAD / MANAGEMENT ----------------
-import dropbox
+VIDEOS_SQL = "SELECT id,label,url,offset FROM videos WHERE match_id=? ORDER BY id"
 
-@st.cache_resource
-def get_dropbox():
-    """Return an authenticated Dropbox client or None if missing/invalid token."""
-    token = None
-    try:
-        token = st.secrets["DROPBOX_ACCESS_TOKEN"]
-    except Exception:
-        token = st.session_state.get("dropbox_token")
-
-    if not token:
-        return None
-
-    try:
-        dbx = dropbox.Dropbox(token)
-        dbx.users_get_current_account()  # Verify token
-        return dbx
-    except Exception as e:
-        st.error(f"Dropbox connection failed: {e}")
-        return None
-
-
-def page_videos(conn):
-    st.header("🎞️ Video Manager")
-
-    st.write("Secrets keys:", list(st.secrets.keys()))
-
-    # ✅ Debug Dropbox connection
-    dbx = get_dropbox()
-    if not dbx:
-        st.warning("🔑 Please add your Dropbox API token to `.streamlit/secrets.toml` as `DROPBOX_ACCESS_TOKEN`.")
-        st.code('[DROPBOX_ACCESS_TOKEN]\nYOUR_ACCESS_TOKEN_HERE', language="toml")
-        st.stop()
-    else:
-        st.success("✅ Connected to Dropbox successfully!")
-
-    matches = _matches_df(conn)
-    if matches.empty:
-        st.warning("Create a match first.")
-        return
-
-    match_id = st.selectbox(
-        "Match",
-        matches["id"].tolist(),
-        format_func=lambda x: f"{matches.set_index('id').loc[x, 'date']} — {matches.set_index('id').loc[x, 'opponent']}"
-    )
-    match = matches.set_index("id").loc[match_id]
-    folder_path = f"/rugby_videos/{match['date']}_{match['opponent'].replace(' ', '_')}"
-
-    st.divider()
-    st.subheader("📤 Add or Upload Video")
-
-    # --- Upload MP4 directly to Dropbox ---
-    uploaded_file = st.file_uploader("Upload MP4", type=["mp4"], key="video_upload")
-    if uploaded_file:
-        upload_name = st.text_input("Filename in Dropbox", value=uploaded_file.name)
-        if st.button("🚀 Upload to Dropbox"):
-            try:
-                dbx.files_upload(uploaded_file.read(), f"{folder_path}/{upload_name}", mute=True)
-                st.success(f"✅ Uploaded `{upload_name}` to {folder_path}")
-                st.rerun()
-            except Exception as e:
-                st.error(f"Dropbox upload failed: {e}")
-
-    # --- Attach an existing Dropbox video to this match ---
-    st.divider()
-    st.subheader("🎬 Select Existing Dropbox Video")
-
-    try:
-        files = dbx.files_list_folder(folder_path).entries
-        mp4_files = [f for f in files if isinstance(f, dropbox.files.FileMetadata) and f.name.lower().endswith(".mp4")]
-
-        if not mp4_files:
-            st.info(f"No videos found in {folder_path}.")
-        else:
-            selected_file = st.selectbox("Choose video", mp4_files, format_func=lambda f: f.name)
-            try:
-                link = dbx.sharing_create_shared_link_with_settings(selected_file.path_lower).url
-            except dropbox.exceptions.ApiError:
-                links = dbx.sharing_list_shared_links(path=selected_file.path_lower).links
-                link = links[0].url if links else None
-
-            if not link:
-                st.error("Could not get Dropbox link.")
-                return
-
-            direct_link = link.replace("?dl=0", "?raw=1").replace("?dl=1", "?raw=1")
-            label = st.text_input("Label", value=selected_file.name.rsplit(".", 1)[0])
-            offset = st.number_input("Start offset (sec)", value=0.0, step=0.5)
-
-            if st.button("➕ Add to Match"):
-                with conn:
-                    conn.execute(
-                        "INSERT INTO videos(match_id,label,url,offset) VALUES(?,?,?,?)",
-                        (match_id, label, direct_link, offset)
-                    )
-                st.success(f"Added video: {label}")
-                st.rerun()
-
-    except Exception as e:
-        st.error(f"Dropbox error: {e}")
-
-    st.divider()
-    st.subheader("🎦 Existing Videos")
-
-    vids = pd.read_sql(
-        "SELECT id,label,url,offset FROM videos WHERE match_id=? ORDER BY id",
-        conn, params=(match_id,)
-    )
-    if vids.empty:
-        st.info("No videos linked to this match yet.")
-    else:
-        for _, v in vids.iterrows():
-            st.markdown(f"**{v['label']}** — Offset: {v['offset']}s")
-            st.video(v["url"])
+def _videos_df(conn, match_id: int):
+    return _cached_read(conn, VIDEOS_SQL, (int(match_id),))
 
+def _video_rows(conn, match_id: int) -> list:
+    return _col_rows(_cached_cols(conn, VIDEOS_SQL, (int(match_id),)))
 
+def _save_bookmarks(conn, before, after):
+    """Write note edits and ticked deletions from the bookmarks data_editor."""
+    old_notes = dict(zip(before["id"], before["note"].fillna("")))
+    deleted = [(int(i),) for i in after.loc[after["delete"], "id"]]
+    kept = after[~after["delete"]]
+    changed = [(n, int(i)) for i, n in zip(kept["id"], kept["note"].fillna("")) if old_notes.get(i) != n]
+    with conn:
+        conn.executemany("UPDATE moments SET note=? WHERE id=?", changed)
+        conn.executemany("DELETE FROM moments WHERE id=?", deleted)
 
 
 def _match_row(conn, match_id: int):
-    r = conn.execute("SELECT id, opponent, date, team_id FROM matches WHERE id=?",
-                     (int(match_id),)).fetchone()
-    return dict(r) if r else None
+    # sqlite3.Row on both writer and readers: key access, no dict copy
+    with _read_conn(conn) as rc:
+        return rc.execute("SELECT m.id, m.opponent, m.date, m.team_id, t.name AS team_name "
+                          "FROM matches m LEFT JOIN teams t ON t.id = m.team_id WHERE m.id=?",
+                          (int(match_id),)).fetchone()
 
 
 # ---------------- USER SETTINGS ----------------
@@ -357,19 +460,19 @@ def page_users(conn, role):
         st.error("Admin only.")
         return
 
-    users = pd.read_sql("SELECT username, role, active FROM users", conn)
+    users = _cached_read(conn, "SELECT username, role, active FROM users")
     st.dataframe(users, use_container_width=True)
 
     st.subheader("➕ Add User")
     new_user = st.text_input("Username")
     new_pass = st.text_input("Password", type="password")
-    new_role = st.selectbox("Role", ["admin","editor","viewer"], key="create_role")
+    new_role = st.selectbox("Role", ROLES, key="create_role")
 
     if st.button("Create User"):
         if not new_user.strip() or not new_pass.strip():
             st.error("Enter username & password")
         else:
-            ph = bcrypt.hashpw(new_pass.encode(), bcrypt.gensalt())
+            ph = hash_password(new_pass)
             try:
                 with conn:
                     conn.execute(
@@ -384,11 +487,11 @@ def page_users(conn, role):
     st.subheader("✏️ Manage Existing User")
     if not users.empty:
         sel = st.selectbox("User", users["username"].tolist(), key="edit_user_sel")
-        r = users[users["username"]==sel].iloc[0]
+        r = users.set_index("username").to_dict("index")[sel]
         new_role = st.selectbox(
             "Role",
-            ["admin","editor","viewer"],
-            index=["admin","editor","viewer"].index(r["role"]),
+            ROLES,
+            index=ROLE_INDEX.get(r["role"], ROLE_INDEX["viewer"]),
             key=f"edit_role_{sel}"
         )
         active = st.checkbox("Active", value=bool(r["active"]), key=f"edit_active_{sel}")
@@ -402,27 +505,31 @@ def page_users(conn, role):
             st.success("Updated")
             st.rerun()
 
-        temp_pw = st.text_input("Temporary Password", key=f"pwreset_{sel}", type="password")
-
-if st.button("Reset Password"):
-    if temp_pw:
-        ph = bcrypt.hashpw(temp_pw.encode(), bcrypt.gensalt())
-        with conn:
-            conn.execute("UPDATE users SET pass_hash=? WHERE username=?", (ph, sel))
-        st.success("Password reset!")
-
-
+        # form: typing doesn't rerun, and the hash runs once per submit
+        with st.form(f"reset_pw_form_{sel}", clear_on_submit=True):
+            temp_pw = st.text_input("Temporary Password", key=f"pwreset_{sel}", type="password")
+            submitted = st.form_submit_button("Reset Password")
+        if submitted:
+            if not temp_pw:
+                st.error("Enter a temporary password")
+            else:
+                ph = hash_password(temp_pw)
+                with conn:
+                    conn.execute("UPDATE users SET pass_hash=? WHERE username=?", (ph, sel))
+                st.success("Password reset!")
 
 # ---------------- SELF ACCOUNT ----------------
 def page_my_account(conn, username):
     st.header("🔐 My Account")
 
-    new_pw = st.text_input("New Password", type="password")
-    if st.button("Change Password", key="self_pw_change"):
+    with st.form("self_pw_form", clear_on_submit=True):
+        new_pw = st.text_input("New Password", type="password")
+        submitted = st.form_submit_button("Change Password")
+    if submitted:
         if not new_pw.strip():
             st.error("Password required")
         else:
-            ph = bcrypt.hashpw(new_pw.encode(), bcrypt.gensalt())
+            ph = hash_password(new_pw)
             with conn:
                 conn.execute("UPDATE users SET pass_hash=? WHERE username=?", (ph, username))
             st.success("Password updated!")
@@ -434,18 +541,16 @@ def page_matches(conn, role):
     if role not in ("admin","editor"):
         st.info("Viewer mode — only admins/editors can create matches.")
 
-    teams = pd.read_sql("SELECT id, name FROM teams ORDER BY name", conn)
-    matches = pd.read_sql("SELECT id, opponent, date, team_id FROM matches ORDER BY date DESC, id DESC", conn)
+    teams = _teams_df(conn)
+    matches = _matches_df(conn)
+    team_names = dict(zip(teams["id"], teams["name"]))
 
     st.subheader("📋 Existing Matches")
     if matches.empty:
         st.info("No matches yet — add one below.")
     else:
-        def _fmt_team(x):
-            if pd.isna(x): return ""
-            return teams.set_index("id").loc[int(x),"name"] if int(x) in teams["id"].tolist() else ""
         show = matches.copy()
-        show["team"] = show["team_id"].apply(_fmt_team)
+        show["team"] = show["team_id"].map(team_names).fillna("")
         st.dataframe(show[["date","opponent","team"]], use_container_width=True)
 
     st.divider()
@@ -459,37 +564,39 @@ def page_matches(conn, role):
         if assign_team:
             team_id = st.selectbox(
                 "Team",
-                teams["id"].tolist(),
-                format_func=lambda x: teams.set_index("id").loc[x,"name"]
+                list(team_names),
+                format_func=team_names.__getitem__
             )
 
     if st.button("Create Match", disabled=role not in ("admin","editor")):
         if not opponent.strip():
             st.error("Opponent required.")
         else:
+            # one statement: skips an existing team+opponent+date, RETURNING tells which.
+            # IS, not =, so a match with no team (NULL) also counts as a duplicate.
             with conn:
-                conn.execute(
-                    "INSERT INTO matches(opponent, date, team_id) VALUES(?,?,?)",
-                    (opponent.strip(), str(date), team_id)
-                )
-            st.success("Match created ✅")
-            st.rerun()
+                row = conn.execute(
+                    "INSERT INTO matches(opponent, date, team_id) SELECT ?,?,? "
+                    "WHERE NOT EXISTS (SELECT 1 FROM matches WHERE opponent=? AND date=? AND team_id IS ?) "
+                    "RETURNING id",
+                    (opponent.strip(), str(date), team_id, opponent.strip(), str(date), team_id)
+                ).fetchone()
+            if row is None:
+                st.warning("This team already has a match against this opponent on that date."
+                           if team_id is not None else
+                           "A match without a team already exists against this opponent on that date.")
+            else:
+                st.success("Match created ✅")
+                st.rerun()
 
     if not matches.empty and role in ("admin","editor"):
         st.divider()
         st.subheader("🗑️ Delete a Match")
-        del_id = st.selectbox(
-            "Select Match to Delete",
-            matches["id"].tolist(),
-            format_func=lambda x: f"{matches.set_index('id').loc[x,'date']} — {matches.set_index('id').loc[x,'opponent']}"
-        )
+        del_id = _match_select("Select Match to Delete", matches)
         if st.button("Delete Match"):
             with conn:
+                # squad/events/videos/moments follow via ON DELETE CASCADE
                 conn.execute("DELETE FROM matches WHERE id=?", (del_id,))
-                conn.execute("DELETE FROM match_squad WHERE match_id=?", (del_id,))
-                conn.execute("DELETE FROM events WHERE match_id=?", (del_id,))
-                conn.execute("DELETE FROM videos WHERE match_id=?", (del_id,))
-                conn.execute("DELETE FROM moments WHERE match_id=?", (del_id,))
             st.warning("Match deleted ⚠️")
             st.rerun()
 
@@ -529,13 +636,14 @@ def page_players(conn, role):
         return
 
     st.subheader("✏️ Edit / Deactivate / Delete")
+    player_names = dict(zip(df["id"], df["name"]))
     pid = st.selectbox(
         "Select player",
-        df["id"].tolist(),
-        format_func=lambda x: df.set_index("id").loc[x, "name"],
+        list(player_names),
+        format_func=player_names.__getitem__,
         key="p_edit_sel"
     )
-    row = df[df["id"] == pid].iloc[0]
+    row = df.set_index("id").to_dict("index")[pid]
 
     e1, e2, e3, e4 = st.columns([2,1,1,1])
     name_edit = e1.text_input("Name", value=row["name"], key=f"p_name_{pid}")
@@ -562,7 +670,6 @@ def page_players(conn, role):
         st.rerun()
 
 # ---------------- VIDEO MANAGEMENT ----------------
-import os
 from pathlib import Path
 
 def page_videos(conn, role):
@@ -574,12 +681,12 @@ def page_videos(conn, role):
         return
 
     # --- Existing videos list
-    vids = pd.read_sql("""
+    vids = _cached_read(conn, """
         SELECT v.id, m.date, m.opponent, v.label, v.kind, v.url, v.offset
         FROM videos v
         JOIN matches m ON v.match_id = m.id
         ORDER BY m.date DESC, v.id DESC
-    """, conn)
+    """)
 
     if not vids.empty:
         st.subheader("Existing Videos")
@@ -590,12 +697,7 @@ def page_videos(conn, role):
     st.divider()
     st.subheader("➕ Add New Video")
 
-    match_id = st.selectbox(
-        "Match",
-        matches["id"].tolist(),
-        format_func=lambda x: f"{matches.set_index('id').loc[x,'date']} — {matches.set_index('id').loc[x,'opponent']}",
-        key="videos_match_select"
-    )
+    match_id = _match_select("Match", matches, key="videos_match_select")
 
 
     label = st.text_input("Label", placeholder="e.g. First half vs Tigers")
@@ -648,6 +750,115 @@ def page_videos(conn, role):
 
 
 # ---------------- TAGGING PAGE ----------------
+@st.fragment
+def _bookmarks_panel(conn, match_id, vid_id):
+    """Paged bookmark editor. A fragment: paging/editing reruns only this panel."""
+    # only the visible window of bookmarks is read (idx_moments_match_video)
+    with _read_conn(conn) as rc:
+        n_bms = rc.execute(
+            "SELECT COUNT(*) FROM moments WHERE match_id=? AND video_id=?", (match_id, vid_id)
+        ).fetchone()[0]
+    bm_page = 1
+    if n_bms > BOOKMARK_PAGE_SIZE:
+        n_pages = -(-n_bms // BOOKMARK_PAGE_SIZE)
+        bm_page = st.number_input(
+            f"Bookmark page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1,
+            key=f"bm_page_{vid_id}"
+        )
+    bms = _cached_read(
+        conn,
+        "SELECT id, printf('%02d:%02d', CAST(video_ts AS INT) / 60, CAST(video_ts AS INT) % 60) AS time, "
+        "video_ts, note FROM moments WHERE match_id=? AND video_id=? ORDER BY video_ts LIMIT ? OFFSET ?",
+        (int(match_id), int(vid_id), BOOKMARK_PAGE_SIZE, (int(bm_page) - 1) * BOOKMARK_PAGE_SIZE)
+    )
+    if not bms.empty:
+        # one editor for the whole page: edit notes in place, tick rows to delete.
+        # Fixed rows: new bookmarks come from Add Bookmark, which sets the time.
+        bms = bms.astype({"video_ts": "float32", "note": "string"}).assign(delete=False)
+        edited = st.data_editor(
+            bms, hide_index=True, use_container_width=True, num_rows="fixed",
+            column_config={"id": None, "delete": st.column_config.CheckboxColumn("Delete")},
+            disabled=["time", "video_ts"],
+            key=f"bm_edit_{vid_id}_{bm_page}"
+        )
+        if st.button("Save bookmarks", key=f"bm_save_{vid_id}"):
+            _save_bookmarks(conn, bms, edited)
+            st.rerun()
+
+
+@st.fragment
+def _tag_panel(conn, match_id, metrics, metrics_by_group, available_players):
+    """Metric picker + player tag buttons. A fragment: a tag click reruns only this panel."""
+    cur_time = st.number_input("Current video time (sec)", value=0.0, step=0.1, key=f"time_{match_id}")
+
+    # --- Step 1: Metric selection (one widget instead of a button grid) ---
+    metric_by_id = {m["id"]: m for m in metrics}
+    metric_opts = [m["id"] for grp_metrics in metrics_by_group.values() for m in grp_metrics]
+    metric_labels = {m["id"]: f"{m['group_name']} / {m['label']}" for m in metrics}
+    st.markdown("### 1️⃣ Choose Metric")
+    metric_id = st.selectbox(
+        "Metric",
+        metric_opts,
+        format_func=metric_labels.__getitem__,
+        key=f"selected_metric_{match_id}"
+    )
+    selected_metric = metric_by_id.get(metric_id)
+
+    # --- Step 2: Player tagging ---
+    if selected_metric:
+        st.markdown(f"### 2️⃣ Log '{selected_metric['label']}' for Player")
+        # converted once per render, not per button
+        mid_i, metric_i, metric_label = int(match_id), int(selected_metric["id"]), selected_metric["label"]
+        key_prefix = f"tag_{mid_i}_"
+        player_cols = st.columns(4)
+        for i, (pid, pname) in enumerate(available_players.items()):
+            if player_cols[i % 4].button(pname, key=f"{key_prefix}{pid}_{metric_i}"):
+                queue_event(conn, mid_i, pid, metric_i, cur_time)
+                st.toast(f"{pname} — {metric_label} @ {cur_time:.1f}s", icon="✅")
+
+    # --- Recent tags: inside the fragment, so each click shows up on its own rerun ---
+    st.divider()
+    st.markdown("### 🕒 Recent Tags")
+    n_pending = len(pending_events())
+    if n_pending and st.button(f"💾 Save {n_pending} pending tag(s)", key=f"flush_{match_id}"):
+        flush_events(conn)  # the list below is read after this: no rerun needed
+    # st.expander would still execute its body; the toggle skips the reads
+    if st.toggle("Show recent tags", value=True, key="show_recent_tags"):
+        _recent_tags(conn, match_id)
+
+
+def _recent_tags(conn, match_id):
+    """The match's last RECENT_TAGS tags as a table."""
+    # names/labels come from the cached lookups, not a join per rerun
+    all_players = _players_soa(conn, only_active=False)
+    player_names = dict(zip(all_players["id"], all_players["name"]))
+    metric_labels = _metric_labels(conn)
+    # newest first: still-queued tags from the session buffer, then only
+    # as many saved rows as are needed to fill the list
+    mid_i = int(match_id)
+    rows = [(pid, mid, round(t, 1), ts, False)
+            for m, pid, mid, t, ts in reversed(pending_events()) if m == mid_i][:RECENT_TAGS]
+    if len(rows) < RECENT_TAGS:
+        with _read_conn(conn) as rc:
+            rows += [(*r, True) for r in rc.execute(
+                RECENT_TAGS_SQL, (mid_i, RECENT_TAGS - len(rows))
+            ).fetchall()]
+    recent = [
+        {
+            "player": player_names.get(pid, "TEAM"),
+            "metric": metric_labels.get(mid),
+            "time": t,
+            "logged_at": ts,
+            "saved": saved,
+        }
+        for pid, mid, t, ts, saved in rows
+    ]
+    if not recent:
+        st.caption("No events logged yet.")
+    else:
+        st.dataframe(recent, use_container_width=True, hide_index=True)
+
+
 def page_tagging(conn, role):
     st.header("🎥 Video + Live Match Tagging")
 
@@ -657,34 +868,29 @@ def page_tagging(conn, role):
         st.warning("Create a match first.")
         return
 
-    match_id = st.selectbox(
-        "Match",
-        matches["id"].tolist(),
-        format_func=lambda x: f"{matches.set_index('id').loc[x, 'date']} — {matches.set_index('id').loc[x, 'opponent']}",
-        key="tagging_match_select"
-    )
+    match_id = _match_select("Match", matches, key="tagging_match_select")
 
     # --- Load Players & Metrics ---
-    players = _players_df(conn).to_dict("records")
-    metrics = _metrics_df(conn, only_active=True).to_dict("records")
+    players = _players_soa(conn)
+    metrics, metrics_by_group = _tag_metrics(conn)
 
     # --- Load Video(s) ---
-    vids = pd.read_sql(
-        "SELECT id,label,url,offset FROM videos WHERE match_id=? ORDER BY id",
-        conn, params=(match_id,)
-    )
-    if vids.empty:
+    vids = _video_rows(conn, match_id)
+    if not vids:
         st.warning("Add a video first.")
         return
 
+    vid_by_id = {v["id"]: v for v in vids}
+    vid_labels = {vid_id: v["label"] for vid_id, v in vid_by_id.items()}
     vid_id = st.selectbox(
         "Video",
-        vids["id"].tolist(),
-        format_func=lambda x: vids.set_index("id").loc[x, "label"],
+        list(vid_by_id),
+        format_func=vid_labels.__getitem__,
         key=f"tag_video_{match_id}"
     )
-    vid = vids.set_index("id").loc[vid_id]
+    vid = vid_by_id[vid_id]
     offset = float(vid["offset"] or 0)
+    flush_on_change(conn, "_tag_scope", (match_id, vid_id))
 
         # --- Layout: sticky video (left) + scrollable tagging (right) ---
     st.markdown("""
@@ -736,19 +942,14 @@ def page_tagging(conn, role):
         if st.button("Add Bookmark", key=f"bm_add_{vid_id}"):
             with conn:
                 conn.execute(
-                    "INSERT INTO moments(match_id,video_id,video_ts,note) VALUES(?,?,?,?)",
+                    INSERT_MOMENT_SQL,
                     (match_id, vid_id, float(t), note.strip())
                 )
             st.session_state[ts_key] = float(t)
+            # the bookmark panel renders below this button, so it already sees the row
             st.success("Bookmark saved!")
-            st.rerun()
 
-        bms = pd.read_sql(
-            "SELECT video_ts,note FROM moments WHERE match_id=? AND video_id=? ORDER BY video_ts",
-            conn, params=(match_id, vid_id)
-        )
-        if not bms.empty:
-            st.dataframe(bms, use_container_width=True)
+        _bookmarks_panel(conn, match_id, vid_id)
 
     # --- Right: scrollable tagging + matchday squad manager ---
     with col2:
@@ -759,62 +960,19 @@ def page_tagging(conn, role):
         squad = _squad_df(conn, int(match_id))
         if squad.empty:
             st.warning("No matchday team selected. Using all active players.")
-            available_players = pd.DataFrame(players)
+            available_players = dict(zip(players["id"], players["name"]))
         else:
-            available_players = squad.rename(columns={"player_id": "id"})[["id", "name"]]
-
-        cur_time = st.number_input("Current video time (sec)", value=0.0, step=0.1, key=f"time_{match_id}")
-
-        # --- Step 1: Category selection ---
-        categories = sorted({m["group_name"] for m in metrics})
-        st.markdown("### 1️⃣ Choose Category")
-        cat_cols = st.columns(3)
-        for i, cat in enumerate(categories):
-            if cat_cols[i % 3].button(cat, key=f"cat_{match_id}_{cat}"):
-                st.session_state[f"selected_cat_{match_id}"] = cat
-                st.session_state.pop(f"selected_metric_{match_id}", None)
-
-        selected_cat = st.session_state.get(f"selected_cat_{match_id}")
-
-        # --- Step 2: Metric selection ---
-        if selected_cat:
-            st.markdown(f"**Selected Category:** {selected_cat}")
-            cat_metrics = [m for m in metrics if m["group_name"] == selected_cat]
-            st.markdown("### 2️⃣ Choose Metric")
-            met_cols = st.columns(3)
-            for i, m in enumerate(cat_metrics):
-                if met_cols[i % 3].button(m["label"], key=f"met_{match_id}_{m['id']}"):
-                    st.session_state[f"selected_metric_{match_id}"] = m
-
-        selected_metric = st.session_state.get(f"selected_metric_{match_id}")
-
-        # --- Step 3: Player tagging ---
-        if selected_metric:
-            st.markdown(f"### 3️⃣ Log '{selected_metric['label']}' for Player")
-            player_cols = st.columns(4)
-            for i, row in enumerate(available_players.itertuples()):
-                if player_cols[i % 4].button(row.name, key=f"tag_{match_id}_{row.id}_{selected_metric['id']}"):
-                    with conn:
-                        conn.execute(
-                            "INSERT INTO events(match_id,player_id,metric_id,value,ts) VALUES(?,?,?,?,datetime('now'))",
-                            (match_id, row.id, selected_metric["id"], cur_time)
-                        )
-                    st.toast(f"{row.name} — {selected_metric['label']} @ {cur_time:.1f}s", icon="✅")
+            available_players = dict(zip(squad["player_id"], squad["name"]))
+
+        _tag_panel(conn, match_id, metrics, metrics_by_group, available_players)
 
         # --- Matchday Squad Manager ---
         st.divider()
         st.subheader("👥 Matchday Squad Manager")
 
-        matches = _matches_df(conn)
-        teams = _teams_df(conn)
         cur = _match_row(conn, int(match_id))
-        current_team = None
-        if cur and cur.get("team_id"):
-            try:
-                current_team = teams.set_index("id").loc[cur["team_id"], "name"]
-                st.caption(f"Linked Team: **{current_team}**")
-            except Exception:
-                pass
+        if cur and cur["team_name"]:
+            st.caption(f"Linked Team: **{cur['team_name']}**")
 
         squad = _squad_df(conn, int(match_id))
         st.write("**Current Squad**")
@@ -825,12 +983,11 @@ def page_tagging(conn, role):
 
         if role in ("admin", "editor"):
             st.markdown("#### Manage Squad")
-            all_players = pd.read_sql("SELECT id,name FROM players WHERE active=1 ORDER BY name", conn)
-
+            player_names = dict(zip(players["id"], players["name"]))
             to_add = st.selectbox(
                 "Add Player",
-                all_players["id"].tolist(),
-                format_func=lambda x: all_players.set_index("id").loc[x, "name"],
+                list(player_names),
+                format_func=player_names.__getitem__,
                 key=f"squad_add_{match_id}"
             )
             if st.button("➕ Add to Squad", use_container_width=True):
@@ -840,10 +997,11 @@ def page_tagging(conn, role):
                 st.rerun()
 
             if not squad.empty:
+                squad_names = dict(zip(squad["player_id"], squad["name"]))
                 to_rm = st.selectbox(
                     "Remove Player",
-                    squad["player_id"].tolist(),
-                    format_func=lambda x: squad.set_index("player_id").loc[x, "name"],
+                    list(squad_names),
+                    format_func=squad_names.__getitem__,
                     key=f"squad_rm_{match_id}"
                 )
                 if st.button("➖ Remove", use_container_width=True):
@@ -854,51 +1012,6 @@ def page_tagging(conn, role):
 
         st.markdown("</div>", unsafe_allow_html=True)
 
-        # --- RECENT TAGS ---
-        st.divider()
-        st.markdown("### 🕒 Recent Tags")
-        recent = pd.read_sql(
-            """
-            SELECT 
-                COALESCE(p.name,'TEAM') AS player,
-                m.label AS metric,
-                ROUND(e.value,1) AS time,
-                e.ts AS logged_at
-            FROM events e
-            LEFT JOIN players p ON p.id = e.player_id
-            LEFT JOIN metrics m ON m.id = e.metric_id
-            WHERE e.match_id = ?
-            ORDER BY e.id DESC
-            LIMIT 12
-            """,
-            conn, params=(match_id,)
-        )
-        if recent.empty:
-            st.caption("No events logged yet.")
-        else:
-            st.dataframe(recent, use_container_width=True, hide_index=True)
-
-
-        # --- Recent Tags ---
-        st.divider()
-        st.markdown("### 🕒 Recent Tags")
-        recent = pd.read_sql(
-            """
-            SELECT COALESCE(p.name,'TEAM') AS player, m.label AS metric, e.value AS time
-            FROM events e
-            LEFT JOIN players p ON p.id=e.player_id
-            LEFT JOIN metrics m ON m.id=e.metric_id
-            WHERE e.match_id=?
-            ORDER BY e.id DESC
-            LIMIT 12
-            """,
-            conn, params=(match_id,)
-        )
-        if recent.empty:
-            st.caption("No events logged yet.")
-        else:
-            st.dataframe(recent, use_container_width=True, hide_index=True)
-
 # ---------------- TEAMS (minimal) ----------------
 def page_teams(conn, role: str):
     import pandas as _pd
@@ -908,7 +1021,7 @@ def page_teams(conn, role: str):
 
     # Show existing teams
     _st.subheader("Teams")
-    teams_df = _pd.read_sql("SELECT id, name, active FROM teams ORDER BY name", conn)
+    teams_df = _teams_df(conn)
     _st.dataframe(teams_df, use_container_width=True)
 
     # View-only for non-admin/editor
@@ -923,13 +1036,16 @@ def page_teams(conn, role: str):
         if not new_team.strip():
             _st.error("Enter a team name.")
         else:
-            try:
-                with conn:
-                    conn.execute("INSERT INTO teams(name, active) VALUES(?, 1)", (new_team.strip(),))
+            # OR IGNORE: a duplicate name is just "no row inserted", no exception.
+            # rowcount is per statement, so other sessions' writes can't skew it.
+            with conn:
+                added = conn.execute("INSERT OR IGNORE INTO teams(name, active) VALUES(?, 1)",
+                                     (new_team.strip(),)).rowcount
+            if added == 0:
+                _st.error("Team name must be unique.")
+            else:
                 _st.success("Team created.")
                 _st.rerun()
-            except sqlite3.IntegrityError:
-                _st.error("Team name must be unique.")
 
     # Quick edit (toggle active / rename / delete)
     _st.subheader("✏️ Edit Team")
@@ -937,13 +1053,14 @@ def page_teams(conn, role: str):
         _st.caption("No teams yet.")
         return
 
+    team_names = dict(zip(teams_df["id"], teams_df["name"]))
     sel_id = _st.selectbox(
         "Select team",
-        teams_df["id"].tolist(),
-        format_func=lambda x: teams_df.set_index("id").loc[x, "name"],
+        list(team_names),
+        format_func=team_names.__getitem__,
         key="teams_edit_sel",
     )
-    row = teams_df.set_index("id").loc[sel_id]
+    row = teams_df.set_index("id").to_dict("index")[sel_id]
     c1, c2, c3 = _st.columns([2, 1, 1])
     new_name = c1.text_input("Name", value=row["name"], key=f"teams_name_{sel_id}")
     new_active = c2.checkbox("Active", value=bool(row["active"]), key=f"teams_active_{sel_id}")
@@ -963,7 +1080,6 @@ def page_teams(conn, role: str):
 # ---------------- REPORTS (placeholder) ----------------
 def page_reports(conn, role):
     import streamlit as _st
-    import pandas as _pd
 
     _st.header("📈 Reports & Analysis")
 
@@ -971,7 +1087,7 @@ def page_reports(conn, role):
 
     # Temporary data view
     try:
-        events = _pd.read_sql("SELECT * FROM events ORDER BY id DESC LIMIT 50", conn)
+        events = _shared_read(conn, "SELECT * FROM events ORDER BY id DESC LIMIT 50")
         if events.empty:
             _st.caption("No events logged yet.")
         else:
@@ -979,42 +1095,104 @@ def page_reports(conn, role):
     except Exception as e:
         _st.error(f"Could not load events: {e}")
 
+    # Weighted leaderboard: each event scores its metric's weight (default 1).
+    # Aggregated in SQLite and cached until the DB file changes.
+    _st.subheader("🏆 Leaderboard")
+    board = _shared_read(conn, LEADERBOARD_SQL)
+    if board.empty:
+        _st.caption("No player events yet.")
+        return
+    _st.dataframe(board, use_container_width=True, hide_index=True)
+
+    import altair as alt  # only paid for when there is something to chart
+    top = board.head(10)
+    _st.altair_chart(
+        alt.Chart(top).mark_bar().encode(
+            x=alt.X("score:Q", title="Weighted score"),
+            y=alt.Y("player:N", sort="-x", title=None),
+        ),
+        use_container_width=True,
+    )
 
-# ---------------- MAIN ROUTER ----------------
-def main(conn, role):
-    init_db(conn)
-
-    tabs = st.tabs([
-    "👤 Users",
-    "👥 Players",
-    "📊 Metrics",
-    "🗓️ Matches",
-    "🏟️ Teams",
-    "🎬 Videos",    # 👈 new
-    "🎥 Tagging",
-    "📈 Reports"
-])
-
-    with tabs[0]:
-        page_users(conn, role)
-
-    with tabs[1]:
-        page_players(conn, role)
-
-    with tabs[2]:
-        page_metrics(conn, role)
-
-    with tabs[3]:
-        page_matches(conn, role)
-
-    with tabs[4]:
-        page_teams(conn, role)
+    # Totals: one column per active metric, pivoted in SQL
+    metrics = _metrics_df(conn)
+    metrics = metrics[metrics["active"] == 1]
+    if not metrics.empty:
+        _st.subheader("Totals")
+        totals = _shared_read(conn, *_totals_sql(metrics)).set_index("player")
+        headers = _metric_headers(metrics)
+        _st.dataframe(totals.rename(columns=headers), use_container_width=True)
+
+        # Rate metrics (per80 flag) per match appearance: no minutes are logged,
+        # so a true per-80 figure can't be computed
+        rate_cols = [f"m{i}" for i in metrics.loc[metrics["per80"] == 1, "id"]]
+        if rate_cols:
+            _st.subheader("Per match")
+            per_match = totals[rate_cols].div(totals["matches"], axis=0).round(2)
+            _st.dataframe(per_match.rename(columns=headers), use_container_width=True)
+
+
+LEADERBOARD_SQL = """
+    SELECT p.name AS player, COUNT(*) AS events,
+           ROUND(SUM(COALESCE(m.weight, 1)), 1) AS score
+    FROM events e
+    JOIN players p ON p.id = e.player_id
+    JOIN metrics m ON m.id = e.metric_id
+    WHERE m.active = 1
+    GROUP BY e.player_id
+    ORDER BY score DESC
+"""
+
+
+def _totals_sql(metrics):
+    # columns are aliased by id ("m12"): labels can repeat, be NULL, or clash with "matches"
+    ids = [int(i) for i in metrics["id"]]
+    cols = ", ".join(f'SUM(e.metric_id = ?) AS "m{i}"' for i in ids)
+    sql = (f"SELECT p.name AS player, COUNT(DISTINCT e.match_id) AS matches, {cols} FROM events e "
+           "JOIN players p ON p.id = e.player_id GROUP BY e.player_id ORDER BY p.name")
+    return sql, tuple(ids)
+
+
+def _metric_headers(metrics) -> dict:
+    """"m{id}" -> unique "group / label" display name for the pivoted report columns."""
+    headers, seen = {}, set()
+    for r in metrics.itertuples(index=False):
+        group = r.group_name if pd.notna(r.group_name) and r.group_name else "Other"
+        label = r.label if pd.notna(r.label) and r.label else r.name
+        name = f"{group} / {label}"
+        if name in seen:
+            name = f"{name} (#{r.id})"
+        seen.add(name)
+        headers[f"m{r.id}"] = name
+    return headers
 
-    with tabs[5]:
-        page_videos(conn, role)      # 👈 new tab
 
-    with tabs[6]:
-        page_tagging(conn, role)
+# ---------------- MAIN ROUTER ----------------
+@st.cache_resource
+def _init_db_once(_conn):
+    # The connection is shared per process (streamlit_app.get_conn), so the
+    # schema/pragmas only need applying once, not on every rerun.
+    init_db(_conn)
+    return True
+
+PAGES = {
+    "👤 Users": page_users,
+    "👥 Players": page_players,
+    "📊 Metrics": page_metrics,
+    "🗓️ Matches": page_matches,
+    "🏟️ Teams": page_teams,
+    "🎬 Videos": page_videos,
+    "🎥 Tagging": page_tagging,
+    "📈 Reports": page_reports,
+}
 
-    with tabs[7]:
-        page_reports(conn, role)
+def main(conn, role):
+    _init_db_once(conn)
+    flush_stale(conn)
+
+    # Only the selected page runs: st.tabs would execute all eight pages
+    # (and their queries) on every rerun just to hide seven of them.
+    page = st.radio("Page", list(PAGES), horizontal=True,
+                    label_visibility="collapsed", key="active_page")
+    flush_on_change(conn, "_page_scope", page)  # leaving a page saves its queued tags
+    PAGES[page](conn, role)
@@ -1,86 +1,28 @@
-# Legacy components we still use (video review + DB init)
+# Legacy components we still use (video review)
+# The schema lives in one place: init_db in the main module, applied once per
+# process by its router.
 
-import sqlite3, datetime as dt
-import pandas as pd
 import streamlit as st
-import altair as alt
 
-# ========= INIT DB (copied from old file) =========
-def init_db(conn: sqlite3.Connection) -> None:
-    SCHEMA = """
-    PRAGMA journal_mode=WAL;
-
-    CREATE TABLE IF NOT EXISTS players(
-      id INTEGER PRIMARY KEY,
-      name TEXT NOT NULL,
-      position TEXT,
-      active INTEGER NOT NULL DEFAULT 1
-    );
-
-    CREATE TABLE IF NOT EXISTS metrics(
-      id INTEGER PRIMARY KEY,
-      name TEXT UNIQUE NOT NULL,
-      label TEXT NOT NULL,
-      group_name TEXT NOT NULL,
-      type TEXT NOT NULL DEFAULT 'count',
-      per80 INTEGER NOT NULL DEFAULT 1,
-      weight REAL,
-      active INTEGER NOT NULL DEFAULT 1
-    );
-
-    CREATE TABLE IF NOT EXISTS matches(
-      id INTEGER PRIMARY KEY,
-      opponent TEXT NOT NULL,
-      date TEXT NOT NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS events(
-      id INTEGER PRIMARY KEY,
-      match_id INTEGER NOT NULL,
-      player_id INTEGER NOT NULL,
-      metric_id INTEGER NOT NULL,
-      value REAL NOT NULL DEFAULT 1,
-      ts TEXT NOT NULL DEFAULT (datetime('now'))
-    );
-
-    CREATE TABLE IF NOT EXISTS videos(
-      id INTEGER PRIMARY KEY,
-      match_id INTEGER NOT NULL,
-      kind TEXT NOT NULL,
-      url TEXT NOT NULL,
-      label TEXT NOT NULL,
-      offset REAL NOT NULL DEFAULT 0
-    );
-
-    CREATE TABLE IF NOT EXISTS moments(
-      id INTEGER PRIMARY KEY,
-      match_id INTEGER NOT NULL,
-      video_id INTEGER NOT NULL,
-      video_ts REAL NOT NULL,
-      note TEXT DEFAULT '',
-      ts TEXT NOT NULL DEFAULT (datetime('now'))
-    );
-    """
-    with conn: conn.executescript(SCHEMA)
+from rugby_stats_app_v5_main import (
+    _cached_read, _matches_df, _match_select, _videos_df, INSERT_MOMENT_SQL,
+)
 
 
 # ========= PAGE: VIDEO REVIEW =========
 def page_video(conn, role):
     st.header("🎥 Video Review")
 
-    matches = pd.read_sql("SELECT * FROM matches ORDER BY date DESC", conn)
+    # reads are cached on the DB file stamp, so reruns without writes skip SQLite
+    matches = _matches_df(conn)
     if matches.empty:
         st.info("No matches yet — create one in Live Logger.")
         return
 
-    mid = st.selectbox(
-        "Match",
-        matches["id"].tolist(),
-        format_func=lambda x: f"{matches.set_index('id').loc[x,'date']} vs {matches.set_index('id').loc[x,'opponent']}"
-    )
+    mid = _match_select("Match", matches)
 
     # Videos
-    vids = pd.read_sql("SELECT * FROM videos WHERE match_id=?", conn, params=(mid,))
+    vids = _videos_df(conn, mid)
     st.write("### Add Video")
     url = st.text_input("YouTube URL")
     label = st.text_input("Label")
@@ -96,8 +38,10 @@ def page_video(conn, role):
         st.info("No videos for this match yet.")
         return
 
-    vid = st.selectbox("Video", vids["id"].tolist(), format_func=lambda x: vids.set_index('id').loc[x,'label'])
-    vrow = vids[vids["id"] == vid].iloc[0]
+    vid_by_id = vids.set_index("id").to_dict("index")
+    vid_labels = {i: v["label"] for i, v in vid_by_id.items()}
+    vid = st.selectbox("Video", list(vid_labels), format_func=vid_labels.__getitem__)
+    vrow = vid_by_id[vid]
     
     st.video(vrow["url"])
 
@@ -108,13 +52,13 @@ def page_video(conn, role):
 
     if st.button("Add Bookmark"):
         with conn:
-            conn.execute("INSERT INTO moments(match_id,video_id,video_ts,note) VALUES(?,?,?,?)",
-                         (mid, vid, ts, note))
+            conn.execute(INSERT_MOMENT_SQL, (mid, vid, ts, note))
         st.success("Added bookmark")
         st.rerun()
 
-    bms = pd.read_sql(
+    bms = _cached_read(
+        conn,
         "SELECT * FROM moments WHERE match_id=? AND video_id=? ORDER BY video_ts",
-        conn, params=(mid, vid)
+        (int(mid), int(vid))
     )
     st.dataframe(bms)
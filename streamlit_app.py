@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
-import os, sqlite3, bcrypt, importlib
+import os, sqlite3, importlib, atexit
 import streamlit as st
+from passwords import hash_password, verify_password, warm_up
+from event_queue import flush_events
+from db_pool import WriterConnection, WRITER_PRAGMAS
 
 # ✅ DB path for Streamlit Cloud persistent storage
 def _db_path():
@@ -14,6 +17,13 @@ def _db_path():
 
 DB_PATH = _db_path()
 
+def _optimize(conn):
+    # SQLite recommends PRAGMA optimize before closing long-lived connections
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+
 # ✅ DB connection
 @st.cache_resource
 def get_conn():
@@ -21,8 +31,16 @@ def get_conn():
     try: os.makedirs(d, exist_ok=True)
     except Exception: pass
 
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    # Large statement cache so hot statements (event insert, lookups) are
+    # parsed once per connection rather than on every click.
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256,
+                           factory=WriterConnection)
     conn.row_factory = sqlite3.Row
+    # WAL + per-connection pragmas: set them here, before the login page's
+    # first query, rather than waiting for init_db
+    conn.executescript(WRITER_PRAGMAS)
+    atexit.register(_optimize, conn)
+    warm_up()
     conn.execute("""
         CREATE TABLE IF NOT EXISTS users (
             username TEXT PRIMARY KEY,
@@ -41,12 +59,12 @@ def ensure_admin(conn):
     if n == 0:
         user = os.environ.get("APP_ADMIN_USER", "admin")
         pw   = os.environ.get("APP_ADMIN_PASS", "admin123")
-        ph   = bcrypt.hashpw(pw.encode(), bcrypt.gensalt())
-        conn.execute(
-            "INSERT INTO users(username, pass_hash, role, active) VALUES(?,?,?,1)",
-            (user, ph, "admin")
-        )
-        conn.commit()
+        ph   = hash_password(pw)
+        with conn:
+            conn.execute(
+                "INSERT INTO users(username, pass_hash, role, active) VALUES(?,?,?,1)",
+                (user, ph, "admin")
+            )
 
 # ✅ Login form
 def login(conn):
@@ -68,7 +86,11 @@ def login(conn):
             st.error("User inactive")
             return
 
-        if bcrypt.checkpw(password.encode(), row["pass_hash"]):
+        ok, rehashed = verify_password(password, row["pass_hash"])
+        if ok:
+            if rehashed:
+                with conn:
+                    conn.execute("UPDATE users SET pass_hash=? WHERE username=?", (rehashed, row["username"]))
             st.session_state.user = {
                 "u": row["username"],
                 "role": row["role"]
@@ -78,8 +100,9 @@ def login(conn):
             st.error("Wrong password")
 
 # ✅ Logout button
-def logout():
+def logout(conn):
     if st.sidebar.button("🚪 Logout"):
+        flush_events(conn)
         st.session_state.clear()
         st.rerun()
 
@@ -94,7 +117,7 @@ def main():
         return
 
     # Logout always present
-    logout()
+    logout(conn)
 
     # Admin sidebar button
     if st.session_state.user.get("role") == "admin":
@@ -1,5 +1,6 @@
 import streamlit as st
-import bcrypt
+from passwords import hash_password
+from rugby_stats_app_v5_main import ROLES, ROLE_INDEX
 
 def user_admin_page(conn):
     st.title("👤 User & Password Management")
@@ -13,13 +14,13 @@ def user_admin_page(conn):
 
     new_user = st.text_input("Username")
     new_pass = st.text_input("Password", type="password")
-    role = st.selectbox("Role", ["admin", "editor", "viewer"])
+    role = st.selectbox("Role", ROLES)
 
     if st.button("Create User"):
         if not new_user or not new_pass:
             st.error("Username & password required")
         else:
-            ph = bcrypt.hashpw(new_pass.encode(), bcrypt.gensalt())
+            ph = hash_password(new_pass)
             try:
                 with conn:
                     conn.execute("INSERT INTO users(username, pass_hash, role, active) VALUES(?,?,?,1)",
@@ -38,7 +39,7 @@ def user_admin_page(conn):
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            new_role = st.selectbox("Role", ["admin","editor","viewer"], index=["admin","editor","viewer"].index(role), key=f"role_{u}")
+            new_role = st.selectbox("Role", ROLES, index=ROLE_INDEX.get(role, ROLE_INDEX["viewer"]), key=f"role_{u}")
         with col2:
             new_active = st.checkbox("Active", value=bool(active), key=f"act_{u}")
         with col3:
@@ -50,12 +51,14 @@ def user_admin_page(conn):
                 st.rerun()
 
         # Reset password
-        new_pw = st.text_input(f"New password for {u}", type="password", key=f"pw_{u}")
-        if st.button(f"Reset Password for {u}", key=f"reset_{u}"):
+        with st.form(f"reset_form_{u}", clear_on_submit=True):
+            new_pw = st.text_input(f"New password for {u}", type="password", key=f"pw_{u}")
+            submitted = st.form_submit_button(f"Reset Password for {u}")
+        if submitted:
             if not new_pw:
                 st.error("Enter new password")
             else:
-                ph = bcrypt.hashpw(new_pw.encode(), bcrypt.gensalt())
+                ph = hash_password(new_pw)
                 with conn:
                     conn.execute("UPDATE users SET pass_hash=? WHERE username=?", (ph, u))
                 st.success("🔐 Password reset")